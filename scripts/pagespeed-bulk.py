@@ -6,47 +6,191 @@ Supports two auth modes for Google Sheets:
   2. gog CLI (--account email) — for OpenClaw/environments with gog installed
 """
 
-import json, os, subprocess, sys, time, urllib.request, urllib.parse, argparse, base64, hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json, os, shutil, subprocess, sys, tempfile, threading, time, urllib.error, urllib.parse, argparse, base64, hashlib
+import gzip, http.client, io, itertools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+try:
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+except ImportError:  # optional — fall back to the openssl CLI for signing
+    serialization = None
+
+try:
+    import orjson
+    _json_loads, _json_dumps = orjson.loads, orjson.dumps
+except ImportError:  # optional — stdlib json is just slower on large PSI payloads
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        return json.dumps(obj).encode()
 
 API_KEY = os.environ.get("GOOGLE_PAGESPEED_API_TOKEN", "")
 MAX_WORKERS = 4
+PSI_ATTEMPTS = 3
+RETRY_STATUSES = (429, 500, 503)  # transient — worth retrying with backoff
+RETRY_AFTER_MAX = 60  # cap on a server-sent Retry-After, so one row can't stall a worker
+
+# Integer-math converters — PSI values are never negative, so these round half up
+def _ms_to_s(v):
+    """1234.5 ms → 1.23 s"""
+    return (int(v + 5) // 10) / 100
+
+
+def _cls_pct(v):
+    """CrUX reports CLS × 100 (26 → 0.26)."""
+    return v / 100
+
+
+def _round3(v):
+    return int(v * 1000 + 0.5) / 1000
+
+
+def _raw(v):
+    return v
+
+
+# (output key, CrUX metric, converter)
+FIELD_METRICS = (
+    ("lcp", "LARGEST_CONTENTFUL_PAINT_MS", _ms_to_s),
+    ("cls", "CUMULATIVE_LAYOUT_SHIFT_SCORE", _cls_pct),
+    ("inp", "INTERACTION_TO_NEXT_PAINT", _raw),
+    ("fcp", "FIRST_CONTENTFUL_PAINT_MS", _ms_to_s),
+    ("ttfb", "EXPERIMENTAL_TIME_TO_FIRST_BYTE", _ms_to_s),
+)
+# (output key, Lighthouse audit, converter, required)
+LAB_AUDITS = (
+    ("lcp", "largest-contentful-paint", _ms_to_s, True),
+    ("cls", "cumulative-layout-shift", _round3, True),
+    ("fcp", "first-contentful-paint", _ms_to_s, True),
+    ("ttfb", "server-response-time", _ms_to_s, False),
+)
+
+# Partial-response mask: only the paths extract_field_data/extract_lab_data read.
+# Full Lighthouse results are hundreds of KB; this trims them to a few hundred bytes.
+PSI_FIELDS = (
+    "loadingExperience(metrics("
+    + ",".join(f"{metric}/percentile" for _, metric, _ in FIELD_METRICS)
+    + "),overall_category),lighthouseResult(audits("
+    + ",".join(f"{audit}/numericValue" for _, audit, _, _ in LAB_AUDITS)
+    + ")),error"
+)
+PSI_FIELDS_PARAM = urllib.parse.quote(PSI_FIELDS, safe=",()/")
+
+# Sheet cells per strategy (B-G mobile, H-M desktop)
+ROW_KEYS = ("lcp", "cls", "inp", "fcp", "ttfb", "assessment")
+ERROR_CELLS = ["ERROR", "", "", "", "", "ERROR"]
+SKIPPED_CELLS = [None] * len(ROW_KEYS)  # null cells are left untouched by the Sheets API
+BLANK_CELLS = [""] * len(ROW_KEYS)  # clears a strategy --fast-field skipped, so no stale values remain
 
 # Globals set in main()
 SPREADSHEET = None
 ACCESS_TOKEN = None
+TOKEN_EXPIRES_AT = 0  # time.monotonic() deadline for ACCESS_TOKEN
 SHEET_NAME = None
 AUTH_MODE = None  # "service_account" or "gog"
 SA_CREDENTIALS = None
 GOG_ACCOUNT = None
-TOKEN_LOCK = __import__('threading').Lock()
+GOG_CREDS = None  # gog's OAuth client credentials, loaded once in main()
+GOG_REFRESH_TOKEN = None  # exported from gog once, reused for every refresh
+STRATEGY_POOL = None  # runs the mobile/desktop calls of one URL side by side
+STRATEGIES = ("mobile", "desktop")
+FAST_FIELD = False  # skip desktop when mobile already returned field data
+CACHE_DIR = os.path.join(".cache", "psi")  # None when --no-cache
+TOKEN_LOCK = threading.Lock()
+_SIGNING_KEYS = {}  # PEM string -> parsed private key (cryptography only)
+_CONNECTIONS = threading.local()  # per-thread keep-alive HTTPS connections by host
+
+# Row writes are queued as (URL index, row, pre-serialized entry) and flushed in one values:batchUpdate call
+PENDING = []
+ROW_TEMPLATE = b'{"range":%s,"majorDimension":"ROWS","values":[%s]}'
+PENDING_LOCK = threading.Lock()
+FLUSH_ROWS = 50       # flush once this many rows are queued
+FLUSH_INTERVAL = 5    # ...or every this many seconds
+FINAL_FLUSH_ATTEMPTS = 4  # tries for the last flush before giving up on the queued rows
+
+
+def _http(method, url, body=None, headers=None, timeout=30):
+    """Send an HTTPS request over a reused keep-alive connection, return the body.
+
+    Each thread keeps one connection per host, so repeated calls to the same
+    Google API skip the TCP+TLS handshake. Responses are requested gzipped
+    (Google APIs also want "gzip" in the User-Agent) and decoded here.
+    Raises urllib.error.HTTPError for 4xx/5xx responses, like urlopen, so
+    callers keep their error handling.
+    """
+    headers = {"Accept-Encoding": "gzip", "User-Agent": "pagespeed-bulk (gzip)", **(headers or {})}
+    parts = urllib.parse.urlsplit(url)
+    path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    pool = getattr(_CONNECTIONS, "pool", None)
+    if pool is None:
+        pool = _CONNECTIONS.pool = {}
+    for attempt in range(2):
+        conn = pool.get(parts.netloc)
+        if conn is None:
+            conn = pool[parts.netloc] = http.client.HTTPSConnection(parts.netloc, timeout=timeout)
+        reused = conn.sock is not None
+        if reused:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except Exception as e:
+            conn.close()
+            del pool[parts.netloc]
+            # The server may have dropped an idle keep-alive connection — reconnect once
+            if reused and attempt == 0 and isinstance(e, (ConnectionError, http.client.BadStatusLine,
+                                                          http.client.CannotSendRequest)):
+                continue
+            raise
+        if resp.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        if resp.status >= 400:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(data))
+        return data
+
+
+def _rs256_sign(msg, key_pem):
+    """Sign msg with RSA-SHA256 — in-process when cryptography is installed."""
+    if serialization is not None:
+        key = _SIGNING_KEYS.get(key_pem)
+        if key is None:
+            key = _SIGNING_KEYS[key_pem] = serialization.load_pem_private_key(
+                key_pem.encode(), password=None)
+        return key.sign(msg, padding.PKCS1v15(), hashes.SHA256())
+
+    # mkstemp gives a private (0600), uniquely named file, so concurrent
+    # refreshes can't clobber each other's key
+    fd, key_path = tempfile.mkstemp(suffix=".pem")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(key_pem)
+        result = subprocess.run(
+            ["openssl", "dgst", "-sha256", "-sign", key_path],
+            input=msg, capture_output=True, check=True
+        )
+    finally:
+        os.remove(key_path)
+    return result.stdout
 
 
 def _jwt_encode(header, payload, key_pem):
-    """Create a signed JWT using RS256 (stdlib only, no pip deps)."""
-    import struct
-    # We need cryptography or jwt lib — fall back to subprocess openssl
+    """Create a signed JWT using RS256."""
     h = base64.urlsafe_b64encode(json.dumps(header).encode()).rstrip(b'=')
     p = base64.urlsafe_b64encode(json.dumps(payload).encode()).rstrip(b'=')
     msg = h + b'.' + p
-    
-    # Write key to temp file, sign with openssl
-    key_path = "/tmp/_sa_key.pem"
-    with open(key_path, 'w') as f:
-        f.write(key_pem)
-    
-    result = subprocess.run(
-        ["openssl", "dgst", "-sha256", "-sign", key_path],
-        input=msg, capture_output=True
-    )
-    os.remove(key_path)
-    
-    sig = base64.urlsafe_b64encode(result.stdout).rstrip(b'=')
+    sig = base64.urlsafe_b64encode(_rs256_sign(msg, key_pem)).rstrip(b'=')
     return (msg + b'.' + sig).decode()
 
 
+def _token_expiry(result):
+    """Monotonic deadline for a token response, with a 60s safety margin."""
+    return time.monotonic() + result.get("expires_in", 3600) - 60
+
+
 def get_access_token_sa():
-    """Get access token via service account JWT assertion."""
+    """Get (access_token, expires_at) via service account JWT assertion."""
     now = int(time.time())
     payload = {
         "iss": SA_CREDENTIALS["client_email"],
@@ -62,28 +206,35 @@ def get_access_token_sa():
         "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
         "assertion": assertion,
     }).encode()
-    req = urllib.request.Request("https://oauth2.googleapis.com/token", data)
-    with urllib.request.urlopen(req) as resp:
-        return json.loads(resp.read())["access_token"]
+    result = _json_loads(_http("POST", "https://oauth2.googleapis.com/token", data,
+                               {"Content-Type": "application/x-www-form-urlencoded"}))
+    return result["access_token"], _token_expiry(result)
+
+
+def _gog_refresh_token():
+    """Export the account's OAuth refresh token from gog (first call only)."""
+    global GOG_REFRESH_TOKEN
+    if GOG_REFRESH_TOKEN is None:
+        subprocess.run(["gog", "auth", "tokens", "export", GOG_ACCOUNT, "--out", "/tmp/gog-tok.json"],
+                       capture_output=True, text=True)
+        try:
+            GOG_REFRESH_TOKEN = json.load(open("/tmp/gog-tok.json"))["refresh_token"]
+        finally:
+            os.remove("/tmp/gog-tok.json")
+    return GOG_REFRESH_TOKEN
 
 
 def get_access_token_gog():
-    """Get access token via gog CLI (OpenClaw environments)."""
-    creds = json.load(open("/home/node/.config/gogcli/credentials.json"))
-    subprocess.run(["gog", "auth", "tokens", "export", GOG_ACCOUNT, "--out", "/tmp/gog-tok.json"],
-                   capture_output=True, text=True)
-    tok_data = json.load(open("/tmp/gog-tok.json"))
+    """Get (access_token, expires_at) via gog CLI (OpenClaw environments)."""
     data = urllib.parse.urlencode({
-        "client_id": creds["client_id"],
-        "client_secret": creds["client_secret"],
-        "refresh_token": tok_data["refresh_token"],
+        "client_id": GOG_CREDS["client_id"],
+        "client_secret": GOG_CREDS["client_secret"],
+        "refresh_token": _gog_refresh_token(),
         "grant_type": "refresh_token"
     }).encode()
-    req = urllib.request.Request("https://oauth2.googleapis.com/token", data)
-    with urllib.request.urlopen(req) as resp:
-        result = json.loads(resp.read())
-    os.remove("/tmp/gog-tok.json")
-    return result["access_token"]
+    result = _json_loads(_http("POST", "https://oauth2.googleapis.com/token", data,
+                               {"Content-Type": "application/x-www-form-urlencoded"}))
+    return result["access_token"], _token_expiry(result)
 
 
 def get_access_token():
@@ -92,62 +243,139 @@ def get_access_token():
     return get_access_token_gog()
 
 
-def refresh_token():
-    global ACCESS_TOKEN
+def get_valid_token():
+    """Return the cached access token, fetching a new one only once it expires."""
+    global ACCESS_TOKEN, TOKEN_EXPIRES_AT
     with TOKEN_LOCK:
-        ACCESS_TOKEN = get_access_token()
+        if ACCESS_TOKEN is None or time.monotonic() >= TOKEN_EXPIRES_AT:
+            ACCESS_TOKEN, TOKEN_EXPIRES_AT = get_access_token()
+        return ACCESS_TOKEN
 
 
-def batch_write_row(row, values):
-    global ACCESS_TOKEN
+def refresh_token(stale):
+    """Replace a token the API rejected with 401.
+
+    Threads that hit 401 together all pass the same stale token; only the
+    first one through the lock fetches, the rest reuse its result.
+    """
+    global ACCESS_TOKEN, TOKEN_EXPIRES_AT
+    with TOKEN_LOCK:
+        if ACCESS_TOKEN == stale:
+            ACCESS_TOKEN, TOKEN_EXPIRES_AT = get_access_token()
+
+
+def batch_write_row(i, row, values):
+    """Queue URL index i's row for the next batch flush."""
     range_str = f"'{SHEET_NAME}'!B{row}:N{row}" if SHEET_NAME else f"B{row}:N{row}"
-    body = json.dumps({"range": range_str, "majorDimension": "ROWS", "values": [values]}).encode()
-    url = (f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}/values/"
-           f"{urllib.parse.quote(range_str)}?valueInputOption=RAW")
-    for attempt in range(2):
-        try:
-            req = urllib.request.Request(url, data=body, method="PUT",
-                                        headers={"Authorization": f"Bearer {ACCESS_TOKEN}",
-                                                 "Content-Type": "application/json"})
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                return
-        except urllib.error.HTTPError as e:
-            if e.code == 401 and attempt == 0:
-                refresh_token()
-            else:
-                print(f"  Sheet write error row {row}: {e}")
-                return
-
-
-def sheet_read_urls():
-    """Read URLs from column A using Sheets API directly."""
-    global ACCESS_TOKEN
-    range_str = urllib.parse.quote("A2:A10000")
-    url = f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}/values/{range_str}"
-    for attempt in range(2):
-        try:
-            req = urllib.request.Request(url, headers={"Authorization": f"Bearer {ACCESS_TOKEN}"})
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                data = json.loads(resp.read())
-            return [row[0].strip() for row in data.get("values", []) if row and row[0].strip()]
-        except urllib.error.HTTPError as e:
-            if e.code == 401 and attempt == 0:
-                refresh_token()
-            else:
-                raise
+    entry = ROW_TEMPLATE % (_json_dumps(range_str), _json_dumps(values))
+    with PENDING_LOCK:
+        PENDING.append((i, row, entry))
+        full = len(PENDING) >= FLUSH_ROWS
+    if full:
+        flush_pending()
+
+
+def flush_pending():
+    """Write all queued rows with a single values:batchUpdate request.
+
+    Rows from a write that failed transiently (token fetch, network error,
+    401/429/5xx) go back on the queue. Returns True once nothing is left to retry.
+    """
+    with PENDING_LOCK:
+        if not PENDING:
+            return True
+        entries = PENDING[:]
+        PENDING.clear()
+        body = b'{"valueInputOption":"RAW","data":[' + b",".join(e for _, _, e in entries) + b"]}"
+        url = f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}/values:batchUpdate"
+        stale = None
+        for attempt in range(2):
+            try:
+                if stale:
+                    refresh_token(stale)
+                token = get_valid_token()
+            except Exception as e:  # token endpoint failure — keep the rows for the next flush
+                error = e
+                break
+            try:
+                _http("POST", url, body, {"Authorization": f"Bearer {token}",
+                                          "Content-Type": "application/json"})
+                return True
+            except urllib.error.HTTPError as e:
+                error = e
+                if e.code == 401 and attempt == 0:
+                    stale = token
+                    continue
+                if e.code < 500 and e.code not in (401, 429):  # bad request — retrying won't help
+                    print(f"  Sheet write error, rows {_rows(entries)} not written: {e}")
+                    return True
+                break
+            except Exception as e:  # resets, timeouts, TLS errors
+                error = e
+                break
+        PENDING[:0] = entries
+        print(f"  Sheet write error ({len(entries)} rows, will retry): {error}")
+        return False
+
+
+def flush_final():
+    """Flush what is still queued at exit, retrying with backoff (2s, 4s, 8s)."""
+    for attempt in range(1, FINAL_FLUSH_ATTEMPTS + 1):
+        if flush_pending():
+            return
+        if attempt < FINAL_FLUSH_ATTEMPTS:
+            time.sleep(2 ** attempt)
+    with PENDING_LOCK:
+        entries = sorted(PENDING)
+    print(f"  {len(entries)} rows were never written to the sheet: {_rows(entries)}\n"
+          f"  Re-run with --start {entries[0][0]} to redo them", flush=True)
+
+
+def _rows(entries):
+    return ", ".join(str(row) for _, row, _ in sorted(entries))
+
+
+def _flush_loop(stop):
+    """Background flusher so rows land in the sheet even when writes trickle in."""
+    while not stop.wait(FLUSH_INTERVAL):
+        flush_pending()
+
+
+def iter_urls(chunk=1000, max_row=10000):
+    """Yield (row number, URL) from column A, reading the sheet one page of rows at a time.
+
+    Blank cells are skipped, so the row number travels with each URL.
+    """
+    for start in range(2, max_row + 1, chunk):
+        end = min(start + chunk - 1, max_row)
+        range_str = urllib.parse.quote(f"A{start}:A{end}")
+        url = f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}/values/{range_str}"
+        for attempt in range(2):
+            token = get_valid_token()
+            try:
+                data = _json_loads(_http("GET", url, headers={"Authorization": f"Bearer {token}"}))
+                break
+            except urllib.error.HTTPError as e:
+                if e.code == 401 and attempt == 0:
+                    refresh_token(token)
+                else:
+                    raise
+        for row, cells in enumerate(data.get("values", []), start):
+            if cells and cells[0].strip():
+                yield row, cells[0].strip()
 
 
 def get_sheet_name():
-    """Detect first sheet name via Sheets API."""
-    global ACCESS_TOKEN
-    url = f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}?fields=sheets.properties.title"
+    """Detect first sheet name and row count via Sheets API — (None, None) on failure."""
+    url = (f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}"
+           f"?fields=sheets.properties(title,gridProperties.rowCount)")
     try:
-        req = urllib.request.Request(url, headers={"Authorization": f"Bearer {ACCESS_TOKEN}"})
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            data = json.loads(resp.read())
-        return data["sheets"][0]["properties"]["title"]
+        data = _json_loads(_http("GET", url, headers={"Authorization": f"Bearer {get_valid_token()}"},
+                                 timeout=15))
+        props = data["sheets"][0]["properties"]
+        return props["title"], props.get("gridProperties", {}).get("rowCount")
     except:
-        return None
+        return None, None
 
 
 def extract_field_data(d):
@@ -156,19 +384,12 @@ def extract_field_data(d):
     oc = le.get("overall_category")
     if not fm or not oc:
         return None
-    lcp_ms = fm.get("LARGEST_CONTENTFUL_PAINT_MS", {}).get("percentile")
-    cls_raw = fm.get("CUMULATIVE_LAYOUT_SHIFT_SCORE", {}).get("percentile")
-    inp_ms = fm.get("INTERACTION_TO_NEXT_PAINT", {}).get("percentile")
-    fcp_ms = fm.get("FIRST_CONTENTFUL_PAINT_MS", {}).get("percentile")
-    ttfb_ms = fm.get("EXPERIMENTAL_TIME_TO_FIRST_BYTE", {}).get("percentile")
-    return {
-        "lcp": round(lcp_ms / 1000, 2) if lcp_ms is not None else "",
-        "cls": round(cls_raw / 100, 2) if cls_raw is not None else "",
-        "inp": inp_ms if inp_ms is not None else "",
-        "fcp": round(fcp_ms / 1000, 2) if fcp_ms is not None else "",
-        "ttfb": round(ttfb_ms / 1000, 2) if ttfb_ms is not None else "",
-        "assessment": oc,
-    }
+    out = {}
+    for key, metric, convert in FIELD_METRICS:
+        v = fm.get(metric, {}).get("percentile")
+        out[key] = "" if v is None else convert(v)
+    out["assessment"] = oc
+    return out
 
 
 def extract_lab_data(d):
@@ -176,69 +397,166 @@ def extract_lab_data(d):
     if not lr:
         return None
     a = lr.get("audits", {})
+    out = {"inp": "", "assessment": ""}
     try:
-        return {
-            "lcp": round(a["largest-contentful-paint"]["numericValue"] / 1000, 2),
-            "cls": round(a["cumulative-layout-shift"]["numericValue"], 3),
-            "inp": "",
-            "fcp": round(a["first-contentful-paint"]["numericValue"] / 1000, 2),
-            "ttfb": round(a.get("server-response-time", {}).get("numericValue", 0) / 1000, 2),
-            "assessment": "",
-        }
+        for key, audit, convert, required in LAB_AUDITS:
+            v = a[audit]["numericValue"] if required else a.get(audit, {}).get("numericValue", 0)
+            out[key] = convert(v)
     except (KeyError, TypeError):
         return None
+    return out
+
+
+def _cache_day_dir():
+    """Today's cache directory — CrUX data only changes daily."""
+    return os.path.join(CACHE_DIR, time.strftime("%Y%m%d"))
+
+
+def _cache_path(url, strategy):
+    key = hashlib.sha1(f"{url}|{strategy}".encode()).hexdigest()
+    return os.path.join(_cache_day_dir(), f"{key}.json.gz")
+
+
+def prune_cache():
+    """Create today's cache directory and delete every other day's entries."""
+    today = _cache_day_dir()
+    os.makedirs(today, exist_ok=True)
+    for entry in os.scandir(CACHE_DIR):
+        if entry.path == today:
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:  # flat files left by older versions
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def cache_get(url, strategy):
+    if not CACHE_DIR:
+        return None
+    try:
+        with open(_cache_path(url, strategy), "rb") as f:
+            return gzip.decompress(f.read())
+    except (OSError, EOFError):
+        return None
+
+
+def cache_put(url, strategy, body):
+    """Store a response atomically (tmp file + rename) so readers never see partial writes."""
+    if not CACHE_DIR:
+        return
+    tmp_path = None
+    try:
+        day_dir = _cache_day_dir()
+        os.makedirs(day_dir, exist_ok=True)  # the date can roll over mid-run
+        fd, tmp_path = tempfile.mkstemp(dir=day_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(gzip.compress(body))
+        os.replace(tmp_path, _cache_path(url, strategy))
+    except OSError:  # caching is best-effort — a failed write never changes the result
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
 
-def run_pagespeed(url, strategy):
-    if not url.startswith("http"):
-        url = f"https://{url}"
+def _psi_fetch(api_url):
+    """GET a PSI URL, retrying transient failures with exponential backoff (2s, 4s)."""
+    for attempt in range(1, PSI_ATTEMPTS + 1):
+        delay = 2 ** attempt
+        try:
+            return _http("GET", api_url, timeout=90)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt == PSI_ATTEMPTS:
+                raise
+            try:
+                delay = max(0, min(int(e.headers.get("Retry-After", delay)), RETRY_AFTER_MAX))
+            except ValueError:  # HTTP-date form — keep our own backoff
+                pass
+        except (OSError, http.client.HTTPException):  # timeouts, resets, TLS errors
+            if attempt == PSI_ATTEMPTS:
+                raise
+        time.sleep(delay)
+
+
+def run_pagespeed(quoted_url, strategy):
+    """Run PSI for an already normalized and percent-encoded URL."""
     api_url = (
         f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed"
-        f"?url={urllib.parse.quote(url, safe='')}&strategy={strategy}"
-        f"&category=performance&key={API_KEY}"
+        f"?url={quoted_url}&strategy={strategy}"
+        f"&category=performance&fields={PSI_FIELDS_PARAM}&key={API_KEY}"
     )
     try:
-        req = urllib.request.Request(api_url)
-        with urllib.request.urlopen(req, timeout=90) as resp:
-            d = json.loads(resp.read())
+        body = cache_get(quoted_url, strategy)
+        cached = body is not None
+        if not cached:
+            body = _psi_fetch(api_url)
+        d = _json_loads(body)
         if "error" in d:
             return None, "Error"
         field = extract_field_data(d)
         if field:
-            return field, "Field"
-        lab = extract_lab_data(d)
-        if lab:
-            return lab, "Lab"
-        return None, "Error"
+            result = field, "Field"
+        else:
+            lab = extract_lab_data(d)
+            if not lab:
+                return None, "Error"
+            result = lab, "Lab"
+        # Only cache usable responses, so a rerun re-queries the rows that failed
+        if not cached:
+            cache_put(quoted_url, strategy, body)
+        return result
     except Exception:
         return None, "Error"
 
 
-def process_url(i, url, total):
-    row = i + 2
-    mobile, m_src = run_pagespeed(url, "mobile")
-    desktop, d_src = run_pagespeed(url, "desktop")
+def process_url(i, row, url):
+    # Normalize and encode once; every strategy call reuses it
+    quoted = urllib.parse.quote(url if url.startswith("http") else f"https://{url}", safe='')
+    if FAST_FIELD:
+        results = {"mobile": run_pagespeed(quoted, "mobile")}
+        if results["mobile"][1] != "Field":
+            results["desktop"] = run_pagespeed(quoted, "desktop")
+    else:
+        # Strategies are independent PSI calls — run them concurrently
+        futures = {s: STRATEGY_POOL.submit(run_pagespeed, quoted, s) for s in STRATEGIES}
+        results = {s: f.result() for s, f in futures.items()}
+    mobile, m_src = results.get("mobile", (None, None))
+    desktop, d_src = results.get("desktop", (None, None))
     source = "Field" if (m_src == "Field" or d_src == "Field") else ("Lab" if (m_src == "Lab" or d_src == "Lab") else "Error")
-    keys = ["lcp", "cls", "inp", "fcp", "ttfb", "assessment"]
+    # Native numbers (not str()) so the sheet gets numeric, sortable cells
     row_data = []
-    if mobile:
-        row_data += [str(mobile[k]) for k in keys]
-    else:
-        row_data += ["ERROR", "", "", "", "", "ERROR"]
-    if desktop:
-        row_data += [str(desktop[k]) for k in keys]
-    else:
-        row_data += ["ERROR", "", "", "", "", "ERROR"]
+    for strategy, data, src in ("mobile", mobile, m_src), ("desktop", desktop, d_src):
+        if data:
+            row_data += [data[k] for k in ROW_KEYS]
+        elif src is not None:
+            row_data += ERROR_CELLS
+        else:
+            # Not run: left out by --strategies keeps old cells; skipped by --fast-field clears them
+            row_data += SKIPPED_CELLS if strategy not in STRATEGIES else BLANK_CELLS
     row_data.append(source)
-    batch_write_row(row, row_data)
-    m_lcp = mobile["lcp"] if mobile else "ERR"
-    d_lcp = desktop["lcp"] if desktop else "ERR"
-    print(f"[{i+1}/{total}] {url} → M:{m_lcp}s D:{d_lcp}s [{source}]", flush=True)
+    batch_write_row(i, row, row_data)
+    m_lcp = mobile["lcp"] if mobile else ("-" if m_src is None else "ERR")
+    d_lcp = desktop["lcp"] if desktop else ("-" if d_src is None else "ERR")
+    print(f"[{i+1}] {url} → M:{m_lcp}s D:{d_lcp}s [{source}]", flush=True)
     return i, source
 
 
+def process_url_safe(i, row, url):
+    """process_url, but an unexpected exception counts as an Error row instead of escaping."""
+    try:
+        return process_url(i, row, url)
+    except Exception as e:
+        print(f"[{i+1}] {url} → EXCEPTION: {e}", flush=True)
+        return i, "Error"
+
+
 def main():
-    global SPREADSHEET, ACCESS_TOKEN, SHEET_NAME, AUTH_MODE, SA_CREDENTIALS, GOG_ACCOUNT, MAX_WORKERS, API_KEY
+    global SPREADSHEET, SHEET_NAME, AUTH_MODE, SA_CREDENTIALS, GOG_ACCOUNT, GOG_CREDS, MAX_WORKERS, API_KEY
+    global STRATEGY_POOL, STRATEGIES, FAST_FIELD, CACHE_DIR
 
     parser = argparse.ArgumentParser(description="Bulk PageSpeed Insights scanner with Google Sheets output")
     parser.add_argument("spreadsheet_id", help="Google Spreadsheet ID (from the URL)")
@@ -250,8 +568,27 @@ def main():
     parser.add_argument("--start", type=int, default=0, help="Start from URL index (0-based)")
     parser.add_argument("--workers", type=int, default=4, help="Parallel workers (default: 4)")
     parser.add_argument("--api-key", help="PageSpeed API key (overrides GOOGLE_PAGESPEED_API_TOKEN env var)")
+    parser.add_argument("--strategies", default="mobile,desktop",
+                        help="Comma-separated strategies to run (default: mobile,desktop)")
+    parser.add_argument("--fast-field", action="store_true",
+                        help="Run mobile first; only run desktop if mobile has no CrUX field data")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call the API instead of reusing today's cached responses")
     args = parser.parse_args()
 
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    if not strategies or any(s not in ("mobile", "desktop") for s in strategies):
+        parser.error("--strategies must be mobile, desktop, or mobile,desktop")
+    # Keep mobile before desktop regardless of the order given
+    STRATEGIES = tuple(s for s in ("mobile", "desktop") if s in strategies)
+    if args.fast_field and STRATEGIES != ("mobile", "desktop"):
+        parser.error("--fast-field needs both strategies (--strategies mobile,desktop)")
+    FAST_FIELD = args.fast_field
+    if args.no_cache:
+        CACHE_DIR = None
+    else:
+        prune_cache()
+
     SPREADSHEET = args.spreadsheet_id
     MAX_WORKERS = args.workers
     
@@ -268,38 +605,53 @@ def main():
     else:
         AUTH_MODE = "gog"
         GOG_ACCOUNT = args.account
+        GOG_CREDS = json.load(open("/home/node/.config/gogcli/credentials.json"))
         print(f"Auth: gog CLI ({GOG_ACCOUNT})", flush=True)
 
-    ACCESS_TOKEN = get_access_token()
-    SHEET_NAME = get_sheet_name()
+    get_valid_token()
+    SHEET_NAME, row_count = get_sheet_name()
     if SHEET_NAME:
         print(f"Sheet: {SHEET_NAME}", flush=True)
 
-    urls = sheet_read_urls()
-    total = len(urls)
     start_idx = args.start
-    print(f"Found {total} URLs, starting from index {start_idx}, workers={MAX_WORKERS}", flush=True)
+    print(f"Reading URLs from column A, starting from index {start_idx}, workers={MAX_WORKERS}", flush=True)
 
-    work = [(i, url) for i, url in enumerate(urls) if i >= start_idx]
+    # URLs stream in page by page; keep at most 2x workers submitted so
+    # memory stays flat no matter how long the sheet is
+    # Only read as far as the sheet actually goes
+    work = itertools.islice(enumerate(iter_urls(max_row=row_count or 10000)), start_idx, None)
+    max_in_flight = MAX_WORKERS * 2
     done = 0
     errors = 0
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(process_url, i, url, total): (i, url) for i, url in work}
-        for future in as_completed(futures):
-            try:
-                idx, source = future.result()
-                done += 1
-                if source == "Error":
-                    errors += 1
-                if done % 25 == 0:
-                    print(f"--- Progress: {done}/{len(work)} done, {errors} errors ---", flush=True)
-            except Exception as e:
-                done += 1
+    def record(finished):
+        nonlocal done, errors
+        for future in finished:
+            idx, source = future.result()
+            done += 1
+            if source == "Error":
                 errors += 1
-                i, url = futures[future]
-                print(f"[{i+1}/{total}] {url} → EXCEPTION: {e}", flush=True)
+            if done % 25 == 0:
+                print(f"--- Progress: {done} done, {errors} errors ---", flush=True)
 
+    stop_flush = threading.Event()
+    threading.Thread(target=_flush_loop, args=(stop_flush,), daemon=True).start()
+
+    # Each URL worker fans out to two strategy calls, so size that pool 2x
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS * 2) as STRATEGY_POOL, \
+                ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            pending = set()
+            for i, (row, url) in work:
+                if len(pending) >= max_in_flight:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    record(finished)
+                pending.add(executor.submit(process_url_safe, i, row, url))
+            record(wait(pending).done)
+    finally:
+        # Write whatever is still queued even if the run is aborted
+        stop_flush.set()
+        flush_final()
     print(f"\n=== COMPLETE: {done} URLs processed, {errors} errors ===", flush=True)
 
 
@@ -1,53 +1,314 @@
 #!/usr/bin/env python3
-"""Retry ERROR rows by scraping web.dev via agent-browser."""
+"""Retry ERROR rows by scraping web.dev via agent-browser (or Chrome over CDP)."""
 
-import json, os, re, subprocess, sys, time, urllib.parse
+import base64, json, os, queue, socket, subprocess, sys, tempfile, threading, time, urllib.error, urllib.parse, urllib.request
+import gzip, http.client, io
+from contextlib import contextmanager
 
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+
+try:
+    import re2 as _re  # google-re2: linear-time matching
+except ImportError:  # optional — stdlib re handles the same patterns
+    import re as _re
 
 # Set via CLI args in main()
 SPREADSHEET = None
 ACCOUNT = None
 SHEET_NAME = None
+MAX_WORKERS = 3
+STRATEGY_POOL = None  # runs the mobile/desktop scrapes of one row side by side
+WRITE_LOCK = threading.Lock()  # guards PENDING_WRITES across row workers
+PENDING_WRITES = []  # (row, range entry) pairs waiting for the next values:batchUpdate
+FLUSH_ROWS = 25
+FINAL_FLUSH_ATTEMPTS = 4  # tries for the last flush before giving up on the queued rows
+WRITES_PER_MINUTE = 50  # stays under the Sheets 60 write requests/min/user quota
+_WRITE_TIMES = deque()  # monotonic send times of the writes in the last minute
+_CONNECTIONS = threading.local()  # per-thread keep-alive HTTPS connections by host
+TOKEN_CACHE = "/tmp/gog-access-tok.json"  # last minted access token, reused across runs
+TOKEN_CACHE_MARGIN = 60  # only reuse a cached token with at least this many seconds left
+ERROR_ROWS_CACHE = ".cache/retry-error-rows.json"  # last scan, keyed by sheet revision
+CDP_PORT = None  # --cdp-port: drive one running Chrome directly instead of agent-browser
+TAB_POOL = None  # persistent tabs shared by all scrapes, built in main()
+
+PAGE_TEXT_JS = "document.body.innerText.substring(0, 3000)"
+# Set on a pooled tab's old document before navigating; the new document starts without it
+STALE_MARK = "__psiStale"
+NEW_DOCUMENT_JS = f"!window.{STALE_MARK} && document.readyState !== 'loading'"
+
+# web.dev report metrics: (group name, label shown above the value, value has a unit)
+WEBDEV_METRICS = (
+    ("lcp", "Largest Contentful Paint (LCP)", True),
+    ("inp", "Interaction to Next Paint (INP)", True),
+    ("cls", "Cumulative Layout Shift (CLS)", False),
+    ("fcp", "First Contentful Paint (FCP)", True),
+    ("ttfb", "Time to First Byte (TTFB)", True),
+)
+
+@lru_cache(maxsize=None)
+def _metrics_re(metrics):
+    r"""Compile one alternation over `metrics` plus the CWV assessment — once per metric set.
+
+    The page text is scanned once instead of once per metric (LCP first —
+    it's always present). Every branch opens with its literal label and the
+    pattern takes no flags, so the engine can skip ahead on the branches'
+    first characters; \s already covers the newline before the verdict.
+    """
+    branches = [rf'{_re.escape(label)}\n(?P<{key}>[\d.]+' + (r'\s*(?:s|ms))' if unit else ')')
+                for key, label, unit in metrics]
+    branches.append(r'Core Web Vitals Assessment:\s*(?P<assessment>Passed|Failed)')
+    return _re.compile('|'.join(branches))
+
+_ALL_METRICS = _metrics_re(WEBDEV_METRICS)
+
+# web.dev messages meaning the report will never show field data for this URL
+_FAIL_RE = _re.compile(r'does not have sufficient|not enough data|Failed to load')
+
+# Per-metric converters, keyed by group name. Timings may be shown in s or ms
+# ("2.1 s", "850 ms"), so each checks the unit once and converts to the
+# sheet's unit (seconds for LCP/FCP/TTFB, whole ms for INP).
+def _secs_round2(v):
+    return round(float(v[:-2]) / 1000, 2) if v.endswith('ms') else round(float(v[:-1]), 2)
+
+def _ms_int(v):
+    return int(float(v[:-2])) if v.endswith('ms') else int(float(v[:-1]) * 1000)
+
+_CONVERTERS = {
+    'lcp': _secs_round2,
+    'inp': _ms_int,
+    'cls': float,
+    'fcp': _secs_round2,
+    'ttfb': _secs_round2,
+    'assessment': lambda v: "FAST" if v == "Passed" else "SLOW",
+}
+
+# One form factor's six sheet cells, in column order; missing metrics write ""
+ROW_KEYS = ("lcp", "cls", "inp", "fcp", "ttfb", "assessment")
+_ROW_CELLS = itemgetter(*ROW_KEYS)
+_BLANK = dict.fromkeys(ROW_KEYS, "")
+
+def _http(method, url, body=None, headers=None, timeout=30):
+    """Send an HTTPS request over a reused keep-alive connection, return the body.
+
+    Each thread keeps one connection per host, so repeated calls to the same
+    Google API skip the TCP+TLS handshake. Responses are requested gzipped
+    (Google APIs also want "gzip" in the User-Agent) and decoded here.
+    Raises urllib.error.HTTPError for 4xx/5xx responses, like urlopen, so
+    callers keep their error handling.
+    """
+    headers = {"Accept-Encoding": "gzip", "User-Agent": "pagespeed-retry-browser (gzip)", **(headers or {})}
+    parts = urllib.parse.urlsplit(url)
+    path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    pool = getattr(_CONNECTIONS, "pool", None)
+    if pool is None:
+        pool = _CONNECTIONS.pool = {}
+    for attempt in range(2):
+        conn = pool.get(parts.netloc)
+        if conn is None:
+            conn = pool[parts.netloc] = http.client.HTTPSConnection(parts.netloc, timeout=timeout)
+        reused = conn.sock is not None
+        if reused:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except Exception as e:
+            conn.close()
+            del pool[parts.netloc]
+            # The server may have dropped an idle keep-alive connection — reconnect once
+            if reused and attempt == 0 and isinstance(e, (ConnectionError, http.client.BadStatusLine,
+                                                          http.client.CannotSendRequest)):
+                continue
+            raise
+        if resp.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        if resp.status >= 400:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(data))
+        return data
+
+def _cached_access_token():
+    """Return the on-disk access token for ACCOUNT if it's still fresh, else None.
+
+    Only a cache file owned by this user and closed to everyone else is trusted.
+    """
+    try:
+        with open(TOKEN_CACHE) as f:
+            st = os.fstat(f.fileno())
+            if st.st_mode & 0o077 or (hasattr(os, "getuid") and st.st_uid != os.getuid()):
+                return None
+            cached = json.load(f)
+        if cached["account"] == ACCOUNT and cached["expiry"] - TOKEN_CACHE_MARGIN > time.time():
+            return cached["access_token"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def _save_access_token(token, expires_in):
+    """Write the token cache, readable only by the current user.
+
+    The token goes to a fresh 0600 temp file that is renamed over the cache,
+    so an existing file's permissions (or owner) never carry over.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(TOKEN_CACHE), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"account": ACCOUNT, "access_token": token, "expiry": time.time() + expires_in}, f)
+        os.replace(tmp_path, TOKEN_CACHE)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def _drop_cached_access_token():
+    """Forget the cached token after the API rejected it."""
+    try:
+        os.remove(TOKEN_CACHE)
+    except OSError:
+        pass
 
 def get_access_token():
+    token = _cached_access_token()
+    if token:
+        return token
     creds = json.load(open("/home/node/.config/gogcli/credentials.json"))
     subprocess.run(["gog", "auth", "tokens", "export", ACCOUNT, "--out", "/tmp/gog-tok.json"],
                    capture_output=True)
     tok_data = json.load(open("/tmp/gog-tok.json"))
-    import urllib.request
     data = urllib.parse.urlencode({
         "client_id": creds["client_id"],
         "client_secret": creds["client_secret"],
         "refresh_token": tok_data["refresh_token"],
         "grant_type": "refresh_token"
     }).encode()
-    req = urllib.request.Request("https://oauth2.googleapis.com/token", data)
-    with urllib.request.urlopen(req) as resp:
-        result = json.loads(resp.read())
+    result = json.loads(_http("POST", "https://oauth2.googleapis.com/token", data,
+                              {"Content-Type": "application/x-www-form-urlencoded"}))
     os.remove("/tmp/gog-tok.json")
+    _save_access_token(result["access_token"], result.get("expires_in", 3600))
     return result["access_token"]
 
-def batch_write_row(row, values, token):
-    import urllib.request as ur
+def queue_row(row, values):
+    """Queue a fixed row, flushing once FLUSH_ROWS have built up."""
     range_str = f"'{SHEET_NAME}'!B{row}:N{row}" if SHEET_NAME else f"B{row}:N{row}"
-    body = json.dumps({"range": range_str, "majorDimension": "ROWS", "values": [values]}).encode()
-    url = (f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}/values/"
-           f"{urllib.parse.quote(range_str)}?valueInputOption=RAW")
-    req = ur.Request(url, data=body, method="PUT",
-                     headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"})
-    with ur.urlopen(req, timeout=30) as resp:
-        pass
+    with WRITE_LOCK:
+        PENDING_WRITES.append((row, {"range": range_str, "majorDimension": "ROWS", "values": [values]}))
+        full = len(PENDING_WRITES) >= FLUSH_ROWS
+    if full:
+        flush_writes()
+
+def _wait_for_write_slot():
+    """Block until another Sheets write fits in the per-minute budget (call under WRITE_LOCK)."""
+    now = time.monotonic()
+    while _WRITE_TIMES and _WRITE_TIMES[0] <= now - 60:
+        _WRITE_TIMES.popleft()
+    if len(_WRITE_TIMES) >= WRITES_PER_MINUTE:
+        time.sleep(_WRITE_TIMES[0] + 60 - now)
+        _WRITE_TIMES.popleft()
+    _WRITE_TIMES.append(time.monotonic())
+
+def flush_writes():
+    """Write all queued rows with a single values:batchUpdate request.
+
+    The token is looked up per flush, so a run that outlives one access
+    token picks up a fresh one; a 401 drops the cached token and retries once.
+    Rows from a write that failed transiently (token fetch, network error,
+    401/429/5xx) go back on the queue. Returns True once nothing is left to retry.
+    """
+    with WRITE_LOCK:
+        if not PENDING_WRITES:
+            return True
+        entries = PENDING_WRITES[:]
+        PENDING_WRITES.clear()
+        body = json.dumps({"valueInputOption": "RAW", "data": [e for _, e in entries]}).encode()
+        url = f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}/values:batchUpdate"
+        _wait_for_write_slot()
+        for attempt in range(2):
+            try:
+                token = get_access_token()
+            except Exception as e:  # token endpoint failure — keep the rows for the next flush
+                error = e
+                break
+            try:
+                _http("POST", url, body, {"Authorization": f"Bearer {token}", "Content-Type": "application/json"})
+                return True
+            except urllib.error.HTTPError as e:
+                error = e
+                if e.code == 401 and attempt == 0:
+                    _drop_cached_access_token()
+                    continue
+                if e.code < 500 and e.code not in (401, 429):  # bad request — retrying won't help
+                    print(f"  Sheet write error, rows {_rows(entries)} not written: {e}", flush=True)
+                    return True
+                break
+            except Exception as e:  # resets, timeouts, TLS errors
+                error = e
+                break
+        PENDING_WRITES[:0] = entries
+        print(f"  Sheet write error ({len(entries)} rows, will retry): {error}", flush=True)
+        return False
+
+def flush_final():
+    """Flush what is still queued at exit, retrying with backoff (2s, 4s, 8s)."""
+    for attempt in range(1, FINAL_FLUSH_ATTEMPTS + 1):
+        if flush_writes():
+            return
+        if attempt < FINAL_FLUSH_ATTEMPTS:
+            time.sleep(2 ** attempt)
+    with WRITE_LOCK:
+        entries = PENDING_WRITES[:]
+    print(f"  {len(entries)} fixed rows were never written to the sheet: {_rows(entries)}\n"
+          f"  Re-run the retry script to scrape them again", flush=True)
+
+def _rows(entries):
+    return ", ".join(str(row) for row in sorted(row for row, _ in entries))
+
+def get_sheet_name(token):
+    """Detect the first sheet's name via the Sheets API — None on failure."""
+    url = (f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}"
+           f"?fields=sheets.properties.title")
+    try:
+        meta = json.loads(_http("GET", url, headers={"Authorization": f"Bearer {token}"}, timeout=15))
+        return meta["sheets"][0]["properties"]["title"]
+    except:
+        return None
 
-def find_error_rows():
-    """Find rows where column B or G (mobile CWV assessment) = ERROR."""
-    r = subprocess.run(
-        ["gog", "sheets", "get", SPREADSHEET, "A2:N10000", "--account", ACCOUNT, "--plain"],
-        capture_output=True, text=True, timeout=30
-    )
+def sheet_revision(token):
+    """Identify the sheet's current contents by its Drive modifiedTime — None on failure."""
+    url = f"https://www.googleapis.com/drive/v3/files/{SPREADSHEET}?fields=modifiedTime"
+    try:
+        meta = json.loads(_http("GET", url, headers={"Authorization": f"Bearer {token}"}, timeout=15))
+        return f"{SPREADSHEET}|{SHEET_NAME}|{meta['modifiedTime']}"
+    except:
+        return None
+
+def find_error_rows(token):
+    """Find rows where column B or G (mobile CWV assessment) = ERROR.
+
+    The scan is cached against the sheet revision, so re-running after a
+    partial failure (nothing written since) skips the range read.
+    """
+    revision = sheet_revision(token)
+    if revision:
+        try:
+            with open(ERROR_ROWS_CACHE) as f:
+                cached = json.load(f)
+            if cached["revision"] == revision:
+                return [tuple(e) for e in cached["errors"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    
+    # Only the URL and the first metric column decide a retry — fetch just A:B
+    range_str = f"'{SHEET_NAME}'!A2:B10000" if SHEET_NAME else "A2:B10000"
+    url = (f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET}/values/"
+           f"{urllib.parse.quote(range_str)}?majorDimension=ROWS&fields=values")
+    data = json.loads(_http("GET", url, headers={"Authorization": f"Bearer {token}"}))
     errors = []
-    for i, line in enumerate(r.stdout.strip().split("\n")):
-        parts = line.split("\t")
+    for i, parts in enumerate(data.get("values", [])):
         url = parts[0].strip() if parts else ""
         if not url:
             continue
@@ -55,80 +316,222 @@ def find_error_rows():
         b_val = parts[1].strip() if len(parts) > 1 else ""
         if b_val == "ERROR" or b_val == "":
             errors.append((i + 2, url))  # row number, url
+    
+    if revision:
+        try:
+            os.makedirs(os.path.dirname(ERROR_ROWS_CACHE), exist_ok=True)
+            tmp_path = f"{ERROR_ROWS_CACHE}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"revision": revision, "errors": errors}, f)
+            os.replace(tmp_path, ERROR_ROWS_CACHE)
+        except OSError:
+            pass
     return errors
 
-def parse_value(text):
-    """Parse '2.1 s' → 2.1, '249 ms' → 249, '0.26' → 0.26"""
-    text = text.strip()
-    if text.endswith(' s'):
-        return float(text[:-2])
-    elif text.endswith(' ms'):
-        return float(text[:-3])
+def _ws_connect(ws_url, timeout=15):
+    """Open a WebSocket (RFC 6455) — just enough client for the DevTools protocol."""
+    parts = urllib.parse.urlsplit(ws_url)
+    sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=timeout)
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((f"GET {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                  f"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    f = sock.makefile("rb")
+    status = f.readline()
+    if b" 101 " not in status:
+        sock.close()
+        raise ConnectionError(f"WebSocket handshake failed: {status!r}")
+    while f.readline() not in (b"\r\n", b""):
+        pass
+    return sock, f
+
+def _ws_send(sock, text):
+    """Send one masked text frame (clients must mask)."""
+    payload = text.encode()
+    n = len(payload)
+    if n < 126:
+        header = bytes([0x81, 0x80 | n])
+    elif n < 65536:
+        header = bytes([0x81, 0x80 | 126]) + n.to_bytes(2, "big")
     else:
+        header = bytes([0x81, 0x80 | 127]) + n.to_bytes(8, "big")
+    mask = os.urandom(4)
+    sock.sendall(header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload)))
+
+def _ws_recv(f):
+    """Read one complete text message, reassembling fragments."""
+    message = b""
+    while True:
+        head = f.read(2)
+        if len(head) < 2:
+            raise ConnectionError("DevTools connection closed")
+        n = head[1] & 0x7f
+        if n == 126:
+            n = int.from_bytes(f.read(2), "big")
+        elif n == 127:
+            n = int.from_bytes(f.read(8), "big")
+        data = f.read(n)
+        opcode = head[0] & 0x0f
+        if opcode == 0x8:
+            raise ConnectionError("DevTools connection closed")
+        if opcode in (0x9, 0xA):  # ping/pong — Chrome doesn't send these unprompted
+            continue
+        message += data
+        if head[0] & 0x80:
+            return message.decode()
+
+class CdpTab:
+    """A Chrome tab driven over the DevTools protocol.
+
+    Chrome must already be running with --remote-debugging-port; every tab
+    shares that one browser process instead of each scrape launching its own.
+    """
+    def __init__(self, port):
+        self.port = port
+        req = urllib.request.Request(f"http://127.0.0.1:{port}/json/new?about:blank", method="PUT")
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            target = json.loads(resp.read())
+        self.target_id = target["id"]
+        self.sock, self.f = _ws_connect(target["webSocketDebuggerUrl"])
+        self.msg_id = 0
+
+    def _call(self, method, **params):
+        self.msg_id += 1
+        _ws_send(self.sock, json.dumps({"id": self.msg_id, "method": method, "params": params}))
+        while True:
+            msg = json.loads(_ws_recv(self.f))
+            if msg.get("id") == self.msg_id:
+                if "error" in msg:
+                    raise RuntimeError(msg["error"].get("message", "CDP error"))
+                return msg.get("result", {})
+
+    def navigate(self, url, timeout=15):
+        """Load url and wait until the tab holds the new document.
+
+        Pooled tabs are reused, so the old document is marked first; polling
+        only starts once that marker is gone and the new page has parsed,
+        never against the previous URL's report.
+        """
+        self._call("Runtime.evaluate", expression=f"window.{STALE_MARK} = true")
+        result = self._call("Page.navigate", url=url)
+        if result.get("errorText"):
+            raise RuntimeError(f"navigation failed: {result['errorText']}")
+        deadline = time.time() + timeout
+        while True:
+            try:
+                r = self._call("Runtime.evaluate", expression=NEW_DOCUMENT_JS, returnByValue=True)
+                if r.get("result", {}).get("value"):
+                    return
+            except RuntimeError:  # "Execution context was destroyed" mid-navigation
+                pass
+            if time.time() >= deadline:
+                raise TimeoutError(f"{url} did not load within {timeout}s")
+            time.sleep(0.25)
+
+    def text(self):
+        r = self._call("Runtime.evaluate", expression=PAGE_TEXT_JS, returnByValue=True)
+        return r.get("result", {}).get("value") or ""
+
+    def close(self):
+        self.sock.close()
         try:
-            return float(text)
-        except:
-            return text
-
-def scrape_webdev(url, strategy="mobile"):
-    """Load web.dev in agent-browser, wait for results, extract CrUX data."""
-    if not url.startswith("http"):
-        url = f"https://{url}"
-    
-    form_factor = "mobile" if strategy == "mobile" else "desktop"
-    encoded = urllib.parse.quote(url, safe='')
-    webdev_url = f"https://pagespeed.web.dev/analysis?url={encoded}&form_factor={form_factor}"
-    
+            urllib.request.urlopen(f"http://127.0.0.1:{self.port}/json/close/{self.target_id}", timeout=15).close()
+        except OSError:
+            pass
+
+class AgentBrowserTab:
+    """An agent-browser session, driven through the CLI.
+
+    Each named session is an isolated browser, so concurrent scrapes
+    must use different sessions or their open/eval calls interleave.
+    """
+    def __init__(self, session=None):
+        self.cmd = ["agent-browser", "--session", session] if session else ["agent-browser"]
+
+    def navigate(self, url):
+        subprocess.run(self.cmd + ["open", url], capture_output=True, timeout=15)
+
+    def text(self):
+        result = subprocess.run(self.cmd + ["eval", PAGE_TEXT_JS], capture_output=True, text=True, timeout=15)
+        # eval prints the value JSON-encoded; fall back to the raw text if it isn't
+        try:
+            text = json.loads(result.stdout)
+        except ValueError:
+            return result.stdout.strip()
+        return text if isinstance(text, str) else ""
+
+    def close(self):
+        subprocess.run(self.cmd + ["close"], capture_output=True, timeout=15)
+
+class TabPool:
+    """A fixed set of browser tabs, handed out one scrape at a time.
+
+    Tabs are opened on first use and then reused for every later scrape,
+    rather than opened and torn down per URL. A tab that errors is closed
+    and its slot reopened on the next acquire.
+    """
+    def __init__(self, size, open_tab):
+        self.open_tab = open_tab
+        self.idle = queue.Queue()
+        for slot in range(size):
+            self.idle.put((slot, None))
+
+    @contextmanager
+    def acquire(self):
+        slot, tab = self.idle.get()
+        try:
+            if tab is None:
+                tab = self.open_tab(slot)
+            yield tab
+        except BaseException:
+            if tab is not None:
+                try:
+                    tab.close()
+                except Exception:
+                    pass
+            tab = None
+            raise
+        finally:
+            self.idle.put((slot, tab))
+
+    def close(self):
+        while not self.idle.empty():
+            _, tab = self.idle.get()
+            if tab is not None:
+                try:
+                    tab.close()
+                except Exception:
+                    pass
+
+def open_tab(slot):
+    """Open pool slot `slot` as a CDP tab or a named agent-browser session."""
+    return CdpTab(CDP_PORT) if CDP_PORT else AgentBrowserTab(f"psi-tab-{slot}")
+
+def scrape_webdev(webdev_url):
+    """Load a web.dev report in a pooled browser tab, wait for results, extract CrUX data."""
     try:
-        # Open the page
-        subprocess.run(["agent-browser", "open", webdev_url], capture_output=True, timeout=15)
-        
-        # Wait for analysis to complete
-        time.sleep(65)
-        
-        # Extract text
-        result = subprocess.run(
-            ["agent-browser", "eval", "document.body.innerText.substring(0, 3000)"],
-            capture_output=True, text=True, timeout=15
-        )
-        text = result.stdout.strip().strip('"').replace('\\n', '\n')
+        with TAB_POOL.acquire() as tab:
+            # Open the page
+            tab.navigate(webdev_url)
+            
+            # Poll the page text until the field-data report renders (typically
+            # 20-40s) instead of always waiting out the worst case
+            deadline = time.time() + 70
+            while True:
+                text = tab.text()
+                if 'Core Web Vitals Assessment' in text or time.time() >= deadline:
+                    break
+                if _FAIL_RE.search(text):
+                    return None  # no CrUX data or load failure — don't wait out the deadline
+                time.sleep(3)
         
         # Parse the CrUX metrics
         data = {}
-        
-        # LCP
-        m = re.search(r'Largest Contentful Paint \(LCP\)\n([\d.]+\s*(?:s|ms))', text)
-        if m:
-            val = m.group(1)
-            data['lcp'] = round(parse_value(val) if 'ms' not in val else parse_value(val)/1000, 2)
-        
-        # INP
-        m = re.search(r'Interaction to Next Paint \(INP\)\n([\d.]+\s*(?:s|ms))', text)
-        if m:
-            val = m.group(1)
-            data['inp'] = int(parse_value(val)) if 'ms' in val else int(parse_value(val)*1000)
-        
-        # CLS
-        m = re.search(r'Cumulative Layout Shift \(CLS\)\n([\d.]+)', text)
-        if m:
-            data['cls'] = float(m.group(1))
-        
-        # FCP
-        m = re.search(r'First Contentful Paint \(FCP\)\n([\d.]+\s*(?:s|ms))', text)
-        if m:
-            val = m.group(1)
-            data['fcp'] = round(parse_value(val) if 'ms' not in val else parse_value(val)/1000, 2)
-        
-        # TTFB
-        m = re.search(r'Time to First Byte \(TTFB\)\n([\d.]+\s*(?:s|ms))', text)
-        if m:
-            val = m.group(1)
-            data['ttfb'] = round(parse_value(val) if 'ms' not in val else parse_value(val)/1000, 2)
-        
-        # CWV Assessment
-        m = re.search(r'Core Web Vitals Assessment:\s*\n?\s*(Passed|Failed)', text)
-        if m:
-            data['assessment'] = "FAST" if m.group(1) == "Passed" else "SLOW"
+        for m in _ALL_METRICS.finditer(text):
+            key = m.lastgroup
+            if key in data:
+                continue  # keep the first occurrence, like re.search did
+            data[key] = _CONVERTERS[key](m.group(key))
         
         if 'lcp' in data:
             return data
@@ -138,69 +541,72 @@ def scrape_webdev(url, strategy="mobile"):
         print(f"  Browser error: {e}")
         return None
 
+def process_row(row, url):
+    """Scrape one ERROR row on both form factors and write it back. Returns True if fixed."""
+    # Normalize and percent-encode once; only the form factor differs per scrape
+    full_url = url if url.startswith("http") else f"https://{url}"
+    report = f"https://pagespeed.web.dev/analysis?url={urllib.parse.quote(full_url, safe='')}&form_factor="
+    fm = STRATEGY_POOL.submit(scrape_webdev, report + "mobile")
+    fd = STRATEGY_POOL.submit(scrape_webdev, report + "desktop")
+    mobile, desktop = fm.result(), fd.result()
+    
+    if not (mobile or desktop):
+        print(f"[{row}] {url} → Still no data", flush=True)
+        return False
+    
+    row_data = [*_ROW_CELLS({**_BLANK, **(mobile or {})}),
+                *_ROW_CELLS({**_BLANK, **(desktop or {})}), "Web.dev"]
+    
+    queue_row(row, row_data)
+    m_lcp = mobile.get("lcp", "?") if mobile else "?"
+    d_lcp = desktop.get("lcp", "?") if desktop else "?"
+    print(f"[{row}] {url} → Fixed! M-LCP:{m_lcp}s D-LCP:{d_lcp}s", flush=True)
+    return True
+
 def main():
-    global SPREADSHEET, ACCOUNT, SHEET_NAME
+    global SPREADSHEET, ACCOUNT, SHEET_NAME, MAX_WORKERS, STRATEGY_POOL, CDP_PORT, TAB_POOL
     
     parser = argparse.ArgumentParser(description="Retry ERROR rows via web.dev browser scraping")
     parser.add_argument("spreadsheet_id", help="Google Spreadsheet ID")
     parser.add_argument("--account", required=True, help="Google account email for Sheets API")
+    parser.add_argument("--workers", type=int, default=3,
+                        help="Rows scraped in parallel, two browser sessions each (default: 3, max: 5)")
+    parser.add_argument("--cdp-port", type=int,
+                        help="Scrape in tabs of a Chrome already running with --remote-debugging-port=PORT")
     args = parser.parse_args()
+    if not 1 <= args.workers <= 5:
+        parser.error("--workers must be between 1 and 5")
     
     SPREADSHEET = args.spreadsheet_id
     ACCOUNT = args.account
+    MAX_WORKERS = args.workers
+    CDP_PORT = args.cdp_port
     
-    # Detect sheet name
-    try:
-        r = subprocess.run(["gog", "sheets", "metadata", SPREADSHEET, "--account", ACCOUNT, "--json"],
-                          capture_output=True, text=True, timeout=15)
-        meta = json.loads(r.stdout)
-        SHEET_NAME = meta["sheets"][0]["properties"]["title"]
-    except:
-        SHEET_NAME = None
+    # Reads use this token; flush_writes() looks one up per batch
+    token = get_access_token()
+    SHEET_NAME = get_sheet_name(token)
     
     print("Finding error rows...", flush=True)
-    errors = find_error_rows()
+    errors = find_error_rows(token)
     print(f"Found {len(errors)} error rows to retry via web.dev scraping", flush=True)
     
     if not errors:
         print("No errors to retry!")
         return
     
-    token = get_access_token()
-    fixed = 0
-    still_broken = 0
+    print(f"Scraping with {MAX_WORKERS} workers...", flush=True)
     
-    for row, url in errors:
-        print(f"[{row}] {url}", flush=True)
-        
-        # Scrape mobile
-        print(f"  Scraping mobile...", flush=True)
-        mobile = scrape_webdev(url, "mobile")
-        time.sleep(5)
-        
-        # Scrape desktop
-        print(f"  Scraping desktop...", flush=True)
-        desktop = scrape_webdev(url, "desktop")
-        time.sleep(5)
-        
-        if mobile or desktop:
-            keys = ["lcp", "cls", "inp", "fcp", "ttfb", "assessment"]
-            row_data = []
-            for d in [mobile, desktop]:
-                if d:
-                    row_data += [str(d.get(k, "")) for k in keys]
-                else:
-                    row_data += ["", "", "", "", "", ""]
-            row_data.append("Web.dev")
-            
-            batch_write_row(row, row_data, token)
-            fixed += 1
-            m_lcp = mobile.get("lcp", "?") if mobile else "?"
-            d_lcp = desktop.get("lcp", "?") if desktop else "?"
-            print(f"  → Fixed! M-LCP:{m_lcp}s D-LCP:{d_lcp}s", flush=True)
-        else:
-            still_broken += 1
-            print(f"  → Still no data", flush=True)
+    # One tab per in-flight scrape: each row worker runs mobile + desktop at once
+    TAB_POOL = TabPool(MAX_WORKERS * 2, open_tab)
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS * 2) as STRATEGY_POOL, \
+                ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="psi") as executor:
+            results = list(executor.map(lambda e: process_row(*e), errors))
+    finally:
+        TAB_POOL.close()
+        flush_final()
+    fixed = sum(results)
+    still_broken = len(results) - fixed
     
     print(f"\n=== RETRY COMPLETE: {fixed} fixed, {still_broken} still broken ===", flush=True)
 